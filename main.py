@@ -1,17 +1,26 @@
 #!/usr/bin/env python
-import streamlit as st
 from pathlib import Path
 import gspread
 import json
 import os
-from datetime import date, datetime # Ensure datetime is imported for current time
 from oauth2client.service_account import ServiceAccountCredentials
 from google.cloud import storage
-import time
 import pandas as pd  # Import the pandas library
-import matplotlib.pyplot as plt
-from google.cloud import storage
+import numpy as np
+import matplotlib.style as mplstyle
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import io
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Apply the plot style once; every Figure created afterwards picks it up.
+mplstyle.use('seaborn-v0_8-whitegrid')
+
+# Let Pillow search for the smallest PNG encoding; the plots are tiny, so the
+# extra CPU is negligible next to the upload and download savings.
+# Pass a copy each time, as matplotlib may add PNG metadata to the dict.
+PNG_SAVE_OPTIONS = {'optimize': True, 'compress_level': 9}
 
 def get_storage_client():
     """
@@ -36,14 +45,14 @@ def get_storage_client():
         print(f"Error initializing Google Cloud Storage client: {e}")
         return None
 
-def save_plot_to_gcs(client, bucket_name, source_file_name, destination_blob_name):
+def save_plot_to_gcs(client, bucket_name, source_bytes, destination_blob_name):
     """
-    Saves a plot (from a BytesIO object) to a Google Cloud Storage bucket.
+    Saves a plot (from its PNG bytes) to a Google Cloud Storage bucket.
 
     Args:
         client (google.cloud.storage.Client): The storage client.
         bucket_name (str): The ID of your GCS bucket.
-        source_file_name (io.BytesIO): A BytesIO object containing the plot image data.
+        source_bytes (bytes): The PNG image data.
         destination_blob_name (str): The desired path/name of the file in the bucket.
     """
     if client is None:
@@ -53,226 +62,222 @@ def save_plot_to_gcs(client, bucket_name, source_file_name, destination_blob_nam
     try:
         bucket = client.bucket(bucket_name)
         blob = bucket.blob(destination_blob_name)
-        
-        # Rewind the stream to the beginning before uploading
-        source_file_name.seek(0)
-        
-        # Upload the in-memory file
-        blob.upload_from_file(source_file_name, content_type='image/png')
+
+        # Plots are small, so send them in a single request rather than
+        # going through a resumable upload
+        blob.upload_from_string(source_bytes, content_type='image/png')
         print(f"File {destination_blob_name} uploaded to {bucket_name}.")
         
     except Exception as e:
         print(f"An error occurred while uploading the file: {e}")
 
 
-def plot_sorted_total_hours_by_date(df):
+def prepare_arrays(df):
     """
-    Plots the total volunteer hours for each date, sorted from highest to lowest.
+    Extracts the submission dates and hours from the sheet DataFrame as typed
+    numpy arrays, ordered by date, so the plotting functions can share them.
 
     Args:
-        df (pd.DataFrame): A DataFrame containing volunteer hour data.
-                          It must have 'submission_date' and 'hours' columns.
+        df (pd.DataFrame): DataFrame with 'submission_date' and 'hours' columns.
+
+    Returns:
+        tuple: (dates, hours) as datetime64[D] and float64 arrays, or None if
+               the DataFrame could not be converted. Blank hours count as zero.
     """
-    # Check if the necessary columns exist
     if 'submission_date' not in df.columns or 'hours' not in df.columns:
         print("Error: DataFrame must contain 'submission_date' and 'hours' columns.")
-        return
+        return None
 
-    # Convert columns to the correct data types
     try:
-        df['submission_date'] = pd.to_datetime(df['submission_date'])
-        df['hours'] = pd.to_numeric(df['hours'])
+        dates = pd.to_datetime(df['submission_date']).to_numpy('datetime64[D]')
+        hours = np.nan_to_num(pd.to_numeric(df['hours']).to_numpy(np.float64))
     except Exception as e:
         print(f"Error converting data types: {e}")
-        return
-
-    # Group by date and sum the hours for each date
-    daily_hours = df.groupby('submission_date')['hours'].sum().reset_index()
-
-    # Sort the daily hours DataFrame by the 'hours' column in descending order
-    sorted_daily_hours = daily_hours.sort_values(by='hours', ascending=False)
-
-    # Create the plot
-    plt.style.use('seaborn-v0_8-whitegrid')
-    plt.figure(figsize=(12, 7))
-
-    # Create a bar plot
-    plt.bar(sorted_daily_hours['submission_date'].dt.strftime('%m-%d'),
-            sorted_daily_hours['hours'],
-            color='teal',
-            edgecolor='black')
-
-    # Add titles and labels
-    plt.title('Total Volunteer Hours by Date (Highest to Lowest)', fontsize=16, pad=20)
-    plt.xlabel('Date', fontsize=12)
-    plt.ylabel('Total Hours', fontsize=12)
-
-    # Rotate x-axis labels for better readability if dates are long
-    plt.xticks(rotation=45, ha='right')
+        return None
 
-    # Add text labels on top of each bar to show the exact value
-    for index, value in enumerate(sorted_daily_hours['hours']):
-        plt.text(index, value + 0.5, str(value), ha='center', va='bottom', fontsize=10)
+    # Skip rows without a date, as a pandas groupby would, then order by date
+    order = np.argsort(dates, kind='stable')
+    order = order[~np.isnat(dates[order])]
+    return dates[order], hours[order]
 
-    plt.tight_layout()
-    #save to a file
-    output_file = 'sorted_total_hours_by_date.png'
-    plt.savefig(output_file, dpi=300)
-    plt.close()  # Close the plot to free up memory
+# Zero-padded strings for month and day numbers, looked up when formatting labels
+ZERO_PADDED = np.array([f'{number:02d}' for number in range(32)])
 
-def plot_cumulative_hours(df, bucket_name, client):
+def format_month_day(dates):
     """
-    Plots the cumulative volunteer hours by date and saves it to a GCS bucket.
+    Formats dates as 'MM-DD' labels using datetime64 arithmetic, without a
+    strftime call per element.
 
     Args:
-        df (pd.DataFrame): DataFrame with 'submission_date' and 'hours' columns.
-        bucket_name (str): The GCS bucket to save the plot to.
-        client (google.cloud.storage.Client): The storage client.
-    """
-    if 'submission_date' not in df.columns or 'hours' not in df.columns:
-        print("Error: DataFrame must contain 'submission_date' and 'hours' columns.")
-        return
-
-    try:
-        df['submission_date'] = pd.to_datetime(df['submission_date'])
-        df['hours'] = pd.to_numeric(df['hours'])
-    except Exception as e:
-        print(f"Error converting data types: {e}")
-        return
+        dates (np.ndarray): datetime64[D] dates.
 
-    df.sort_values(by='submission_date', inplace=True)
-    df['cumulative_hours'] = df['hours'].cumsum()
+    Returns:
+        np.ndarray: The 'MM-DD' label for each date.
+    """
+    months = dates.astype('datetime64[M]')
+    month_numbers = months.astype(np.int64) % 12 + 1
+    day_numbers = (dates - months).astype(np.int64) + 1
+    return np.char.add(np.char.add(ZERO_PADDED[month_numbers], '-'), ZERO_PADDED[day_numbers])
 
-    plt.style.use('seaborn-v0_8-whitegrid')
-    plt.figure(figsize=(10, 6))
-    plt.plot(df['submission_date'], df['cumulative_hours'], marker='o', linestyle='-', color='b')
-    plt.title('Cumulative PTA Volunteer Hours Over Time', fontsize=16, pad=20)
-    plt.xlabel('Date', fontsize=12)
-    plt.ylabel('Cumulative Hours', fontsize=12)
-    plt.gcf().autofmt_xdate()
-    plt.grid(True)
-    plt.tight_layout()
+def aggregate_daily_hours(dates, hours):
+    """
+    Totals the hours for each date and keeps a running total, in one pass, so
+    both plots can read from the same aggregates.
 
-    # Save the plot to a BytesIO object in memory
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close() # Close the figure to free up memory
+    Args:
+        dates (np.ndarray): Submission dates from prepare_arrays.
+        hours (np.ndarray): Hours for each submission from prepare_arrays.
 
-    # Save the plot from the in-memory object to Google Cloud Storage
-    save_plot_to_gcs(client, bucket_name, buf, 'cumulative_hours_plot.png')
+    Returns:
+        tuple: (days, daily_totals, cumulative_hours), one entry per distinct date.
+    """
+    # The arrays are ordered by date, so each date's rows are contiguous and
+    # can be summed from the index of their first row.
+    days, first_rows = np.unique(dates, return_index=True)
+    daily_totals = np.add.reduceat(hours, first_rows) if first_rows.size else hours[:0]
+    return days, daily_totals, np.cumsum(daily_totals)
 
-def plot_sorted_total_hours_by_date(df, bucket_name, client):
+def plot_cumulative_hours(days, cumulative_hours):
     """
-    Plots the total volunteer hours for each date, sorted highest to lowest,
-    and saves it to a GCS bucket.
+    Plots the cumulative volunteer hours by date.
 
     Args:
-        df (pd.DataFrame): DataFrame with 'submission_date' and 'hours' columns.
-        bucket_name (str): The GCS bucket to save the plot to.
-        client (google.cloud.storage.Client): The storage client.
-    """
-    if 'submission_date' not in df.columns or 'hours' not in df.columns:
-        print("Error: DataFrame must contain 'submission_date' and 'hours' columns.")
-        return
+        days (np.ndarray): Distinct dates from aggregate_daily_hours.
+        cumulative_hours (np.ndarray): Running total of hours at the end of each day.
 
-    try:
-        df['submission_date'] = pd.to_datetime(df['submission_date'])
-        df['hours'] = pd.to_numeric(df['hours'])
-    except Exception as e:
-        print(f"Error converting data types: {e}")
-        return
+    Returns:
+        bytes: The rendered PNG, ready to be saved with save_plot_to_gcs.
+    """
+    fig = Figure(figsize=(10, 6), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.plot(days, cumulative_hours, marker='o', linestyle='-', color='b')
+    ax.set_title('Cumulative PTA Volunteer Hours Over Time', fontsize=16, pad=20)
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Cumulative Hours', fontsize=12)
+    fig.autofmt_xdate()
+    ax.grid(True)
+    fig.tight_layout()
+
+    # Save the plot to an in-memory buffer, released as soon as its bytes are copied
+    with io.BytesIO() as buf:
+        canvas.print_png(buf, pil_kwargs=dict(PNG_SAVE_OPTIONS))
+        return buf.getvalue()
+
+def plot_sorted_total_hours_by_date(days, daily_totals):
+    """
+    Plots the total volunteer hours for each date, sorted highest to lowest.
 
-    daily_hours = df.groupby('submission_date')['hours'].sum().reset_index()
-    sorted_daily_hours = daily_hours.sort_values(by='hours', ascending=False)
+    Args:
+        days (np.ndarray): Distinct dates from aggregate_daily_hours.
+        daily_totals (np.ndarray): Total hours for each date.
 
-    plt.style.use('seaborn-v0_8-whitegrid')
-    plt.figure(figsize=(12, 7))
-    plt.bar(sorted_daily_hours['submission_date'].dt.strftime('%m-%d'),
-            sorted_daily_hours['hours'],
-            color='teal',
-            edgecolor='black')
-    plt.title('Total Volunteer Hours by Date (Highest to Lowest)', fontsize=16, pad=20)
-    plt.xlabel('Date', fontsize=12)
-    plt.ylabel('Total Hours', fontsize=12)
-    plt.xticks(rotation=45, ha='right')
+    Returns:
+        bytes: The rendered PNG, ready to be saved with save_plot_to_gcs.
+    """
+    # Sort the dates by their total hours, highest first
+    order = np.argsort(-daily_totals, kind='stable')
+    sorted_dates = days[order]
+    sorted_totals = daily_totals[order]
+
+    fig = Figure(figsize=(12, 7), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    bars = ax.bar(format_month_day(sorted_dates),
+                  sorted_totals,
+                  color='teal',
+                  edgecolor='black')
+    ax.set_title('Total Volunteer Hours by Date (Highest to Lowest)', fontsize=16, pad=20)
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Total Hours', fontsize=12)
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
 
-    for index, value in enumerate(sorted_daily_hours['hours']):
-        plt.text(index, value + 0.5, str(value), ha='center', va='bottom', fontsize=10)
+    # Add text labels on top of each bar to show the exact value
+    ax.bar_label(bars, labels=[f'{value:g}' for value in sorted_totals], padding=3, fontsize=10)
 
-    plt.tight_layout()
+    fig.tight_layout()
 
-    # Save the plot to a BytesIO object in memory
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close() # Close the figure to free up memory
+    # Save the plot to an in-memory buffer, released as soon as its bytes are copied
+    with io.BytesIO() as buf:
+        canvas.print_png(buf, pil_kwargs=dict(PNG_SAVE_OPTIONS))
+        return buf.getvalue()
 
-    # Save the plot from the in-memory object to Google Cloud Storage
-    save_plot_to_gcs(client, bucket_name, buf, 'total_hours_plot.png')
 
+@functools.lru_cache(maxsize=1)
+def get_gspread_client():
+    """
+    Loads the service account credentials and returns an authorized gspread client.
 
-def get_gsheet():
-    # ... (Your existing get_gsheet function) ...
+    The result is cached, so the credentials file is only read and parsed once
+    per process. Errors are raised to the caller and are not cached.
+    """
     scope = [
         "https://spreadsheets.google.com/feeds",
         "https://www.googleapis.com/auth/drive"
     ]
 
-    creds_dict= None
-    
     creds_path= os.environ.get("GOOGLE_CREDS_PATH")
     creds_dir= Path(creds_path)
 
     creds_file = creds_dir / "hage-pta-fab6351c88f5.json"
 
+    with open(creds_file) as f:
+        creds_dict = json.load(f)
+
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+    return gspread.authorize(creds)
+
+def get_gsheet():
     try:
-        with open(creds_file) as f:
-            creds_dict = json.load(f)
+        client = get_gspread_client()
+        return client.open("PTA_Volunteer_Hours_2025-26").worksheet("hours")
     except FileNotFoundError:
         print("Google credentials file not found. Please check the path.")
         return None
     except json.JSONDecodeError:
         print("Error decoding JSON from Google credentials file.")
         return None
+    except Exception as e:
+        print(f"Error authorizing Google Sheets: {e}")
+        return None
 
-    if creds_dict:
-        try:
-            creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-            client = gspread.authorize(creds)
-            return client.open("PTA_Volunteer_Hours_2025-26").worksheet("hours")
-        except Exception as e:
-            print(f"Error authorizing Google Sheets: {e}")
-            return None
-        
 def main():
     gsheet = get_gsheet()
     BUCKET_NAME = "volunteer_hours"
     
     if gsheet:
         try:
-            # Get all records as a list of dictionaries
-            data = gsheet.get_all_records()
-            
-            # Create a pandas DataFrame from the list of dictionaries
-            df = pd.DataFrame(data)
+            # Get all values as a list of rows; the first row is the header
+            rows = gsheet.get_all_values()
 
+            # Create a pandas DataFrame straight from the 2D list
+            df = pd.DataFrame(rows[1:], columns=rows[0]) if rows else pd.DataFrame()
+
+            # Convert the columns to typed arrays once, up front, for all plots
+            arrays = prepare_arrays(df)
+            if arrays is None:
+                return None
+            days, daily_totals, cumulative_hours = aggregate_daily_hours(*arrays)
 
-            
             # You can now work with the DataFrame
             print("Successfully read Google Sheet into a pandas DataFrame.")
 
             storage_client = get_storage_client()
             if storage_client:
-                # Call the plotting functions with the DataFrame, bucket name, and client
-                plot_cumulative_hours(df, BUCKET_NAME, storage_client)
-                plot_sorted_total_hours_by_date(df, BUCKET_NAME, storage_client)
+                # The plots are independent, so render them side by side and
+                # upload each one as soon as it is ready
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    renders = {
+                        'cumulative_hours_plot.png': executor.submit(plot_cumulative_hours, days, cumulative_hours),
+                        'total_hours_plot.png': executor.submit(plot_sorted_total_hours_by_date, days, daily_totals),
+                    }
+                    for blob_name, render in renders.items():
+                        executor.submit(save_plot_to_gcs, storage_client, BUCKET_NAME, render.result(), blob_name)
             else:
                 print("Skipping plot saving due to GCS client initialization error.")
-            
-            plot_cumulative_hours(df, BUCKET_NAME, storage_client)
-            plot_sorted_total_hours_by_date(df, BUCKET_NAME, storage_client)
-            
-            
-            
+
         except gspread.exceptions.APIError as e:
             print(f"API Error when reading from Google Sheet: {e}")
             return None
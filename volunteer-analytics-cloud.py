@@ -1,52 +1,82 @@
 import pandas as pd
+import numpy as np
 import gspread
-import json
 import io
-import matplotlib.pyplot as plt
-from pathlib import Path
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib.style as mplstyle
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from oauth2client.service_account import ServiceAccountCredentials
 from google.cloud import storage
 import functions_framework
 
+mplstyle.use('seaborn-v0_8-whitegrid')
+
+# --- Configuration ---
+BUCKET_NAME = "volunteer_hours"
+PNG_SAVE_OPTIONS = {'optimize': True, 'compress_level': 9}
+
+# Path where the secret will be mounted in the container.
+# The name of the file inside the container is 'credentials.json'.
+CREDS_FILE_PATH = "/etc/secrets/credentials.json"
+
+@functools.lru_cache(maxsize=1)
+def get_gspread_client():
+    """
+    Returns an authorized gspread client, loading the mounted credentials only
+    on the first request an instance serves.
+    """
+    scope = [
+        "https://spreadsheets.google.com/feeds",
+        "https://www.googleapis.com/auth/drive"
+    ]
+    creds = ServiceAccountCredentials.from_json_keyfile_name(CREDS_FILE_PATH, scope)
+    return gspread.authorize(creds)
+
+@functools.lru_cache(maxsize=1)
+def get_bucket():
+    """
+    Returns the GCS bucket, creating the storage client on first use so warm
+    instances reuse its authorized connection pool across requests.
+    """
+    return storage.Client().bucket(BUCKET_NAME)
+
 @functions_framework.http
 def generate_and_save_plots(request):
     """
     HTTP Cloud Function/Run service that generates and saves plots to a GCS bucket.
     """
-    # --- Configuration ---
-    BUCKET_NAME = "volunteer_hours"
-    
-    # Path where the secret will be mounted in the container.
-    # The name of the file inside the container is 'credentials.json'.
-    CREDS_FILE_PATH = "/etc/secrets/credentials.json"
-    
     try:
         # Step 1: Authorize Google Sheets with the credentials file from the mounted secret
-        scope = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/drive"
-        ]
-        
         try:
-            creds = ServiceAccountCredentials.from_json_keyfile_name(CREDS_FILE_PATH, scope)
-            client = gspread.authorize(creds)
+            client = get_gspread_client()
             gsheet = client.open("PTA_Volunteer_Hours_2025-26").worksheet("hours")
         except Exception as e:
             print(f"Error authorizing Google Sheets: {e}")
             return f"Error authorizing Google Sheets: {e}", 500
 
         # Step 2: Read the data into a pandas DataFrame
-        data = gsheet.get_all_records()
-        hours_df = pd.DataFrame(data)
+        rows = gsheet.get_all_values()
+        hours_df = pd.DataFrame(rows[1:], columns=rows[0]) if rows else pd.DataFrame()
+        try:
+            days, daily_totals, cumulative_hours = aggregate_daily_hours(*prepare_arrays(hours_df))
+        except Exception as e:
+            print(f"Error converting data types: {e}")
+            return f"Error converting data types: {e}", 500
         print("Google Sheet data successfully loaded into DataFrame.")
 
-        # Step 3: Initialize Google Cloud Storage client.
-        storage_client = storage.Client()
-
-        # Step 4: Generate and save the plots to the GCS bucket
+        # Step 3: Generate and save the plots to the GCS bucket
         print("Generating and saving plots...")
-        plot_cumulative_hours(hours_df, BUCKET_NAME, storage_client)
-        plot_sorted_total_hours_by_date(hours_df, BUCKET_NAME, storage_client)
+        # Create the shared bucket before the uploads race to initialize it.
+        get_bucket()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            renders = {
+                'cumulative_hours_plot.png': executor.submit(plot_cumulative_hours, days, cumulative_hours),
+                'total_hours_plot.png': executor.submit(plot_sorted_total_hours_by_date, days, daily_totals),
+            }
+            for blob_name, render in renders.items():
+                executor.submit(save_plot_to_gcs, render.result(), blob_name)
         
         return "Plots generated and saved successfully!", 200
         
@@ -55,68 +85,85 @@ def generate_and_save_plots(request):
         return f"An unexpected error occurred: {e}", 500
 
 # The following helper functions are unchanged from the previous code block.
-def save_plot_to_gcs(client, bucket_name, source_file_name, destination_blob_name):
+def save_plot_to_gcs(source_bytes, destination_blob_name):
     try:
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(destination_blob_name)
-        source_file_name.seek(0)
-        blob.upload_from_file(source_file_name, content_type='image/png')
-        print(f"File {destination_blob_name} uploaded to {bucket_name}.")
+        blob = get_bucket().blob(destination_blob_name)
+        blob.upload_from_string(source_bytes, content_type='image/png')
+        print(f"File {destination_blob_name} uploaded to {BUCKET_NAME}.")
     except Exception as e:
         print(f"An error occurred while uploading the file: {e}")
 
-def plot_cumulative_hours(df, bucket_name, client):
-    try:
-        df['submission_date'] = pd.to_datetime(df['submission_date'])
-        df['hours'] = pd.to_numeric(df['hours'])
-    except Exception as e:
-        print(f"Error converting data types: {e}")
-        return
-    df.sort_values(by='submission_date', inplace=True)
-    df['cumulative_hours'] = df['hours'].cumsum()
-    plt.style.use('seaborn-v0_8-whitegrid')
-    plt.figure(figsize=(10, 6))
-    plt.plot(df['submission_date'], df['cumulative_hours'], marker='o', linestyle='-', color='b')
-    plt.title('Cumulative PTA Volunteer Hours Over Time', fontsize=16, pad=20)
-    plt.xlabel('Date', fontsize=12)
-    plt.ylabel('Cumulative Hours', fontsize=12)
-    plt.gcf().autofmt_xdate()
-    plt.grid(True)
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close()
-    save_plot_to_gcs(client, bucket_name, buf, 'cumulative_hours_plot.png')
-
-def plot_sorted_total_hours_by_date(df, bucket_name, client):
+def prepare_arrays(df):
+    """
+    Returns the date-ordered submission dates and hours as typed numpy arrays,
+    once for all plots. Rows without a date are skipped; blank hours count as zero.
+    """
+    dates = pd.to_datetime(df['submission_date']).to_numpy('datetime64[D]')
+    hours = np.nan_to_num(pd.to_numeric(df['hours']).to_numpy(np.float64))
+    order = np.argsort(dates, kind='stable')
+    order = order[~np.isnat(dates[order])]
+    return dates[order], hours[order]
+
+ZERO_PADDED = np.array([f'{number:02d}' for number in range(32)])
+
+def format_month_day(dates):
+    """
+    Returns 'MM-DD' labels for datetime64[D] dates without per-element strftime.
+    """
+    months = dates.astype('datetime64[M]')
+    month_numbers = months.astype(np.int64) % 12 + 1
+    day_numbers = (dates - months).astype(np.int64) + 1
+    return np.char.add(np.char.add(ZERO_PADDED[month_numbers], '-'), ZERO_PADDED[day_numbers])
+
+def aggregate_daily_hours(dates, hours):
+    """
+    Returns each distinct date with its total and running total of hours.
+    """
+    # Dates are sorted, so each date's hours can be summed from its first row.
+    days, first_rows = np.unique(dates, return_index=True)
+    daily_totals = np.add.reduceat(hours, first_rows) if first_rows.size else hours[:0]
+    return days, daily_totals, np.cumsum(daily_totals)
+
+def plot_cumulative_hours(days, cumulative_hours):
+    fig = Figure(figsize=(10, 6), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.plot(days, cumulative_hours, marker='o', linestyle='-', color='b')
+    ax.set_title('Cumulative PTA Volunteer Hours Over Time', fontsize=16, pad=20)
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Cumulative Hours', fontsize=12)
+    fig.autofmt_xdate()
+    ax.grid(True)
+    fig.tight_layout()
+    with io.BytesIO() as buf:
+        canvas.print_png(buf, pil_kwargs=dict(PNG_SAVE_OPTIONS))
+        return buf.getvalue()
+
+def plot_sorted_total_hours_by_date(days, daily_totals):
     """
     Plots the total volunteer hours for each date, sorted from highest to lowest.
     """
-    try:
-        df['submission_date'] = pd.to_datetime(df['submission_date'])
-        df['hours'] = pd.to_numeric(df['hours'])
-    except Exception as e:
-        print(f"Error converting data types: {e}")
-        return
-    daily_hours = df.groupby('submission_date')['hours'].sum().reset_index()
-    sorted_daily_hours = daily_hours.sort_values(by='hours', ascending=False)
-    plt.style.use('seaborn-v0_8-whitegrid')
-    plt.figure(figsize=(12, 7))
-    plt.bar(sorted_daily_hours['submission_date'].dt.strftime('%m-%d'),
-            sorted_daily_hours['hours'],
-            color='teal',
-            edgecolor='black')
-    plt.title('Total Volunteer Hours by Date (Highest to Lowest)', fontsize=16, pad=20)
-    plt.xlabel('Date', fontsize=12)
-    plt.ylabel('Total Hours', fontsize=12)
-    plt.xticks(rotation=45, ha='right')
-    for index, value in enumerate(sorted_daily_hours['hours']):
-        plt.text(index, value + 0.5, str(value), ha='center', va='bottom', fontsize=10)
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close()
-    save_plot_to_gcs(client, bucket_name, buf, 'total_hours_plot.png')
+    order = np.argsort(-daily_totals, kind='stable')
+    sorted_dates = days[order]
+    sorted_totals = daily_totals[order]
+    fig = Figure(figsize=(12, 7), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    bars = ax.bar(format_month_day(sorted_dates),
+                  sorted_totals,
+                  color='teal',
+                  edgecolor='black')
+    ax.set_title('Total Volunteer Hours by Date (Highest to Lowest)', fontsize=16, pad=20)
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Total Hours', fontsize=12)
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
+    ax.bar_label(bars, labels=[f'{value:g}' for value in sorted_totals], padding=3, fontsize=10)
+    fig.tight_layout()
+    with io.BytesIO() as buf:
+        canvas.print_png(buf, pil_kwargs=dict(PNG_SAVE_OPTIONS))
+        return buf.getvalue()
 
 
 #gcloud builds submit --tag gcr.io/hage-pta/pta-analytics-job --region us-central1